@@ -4,12 +4,36 @@ Git Repository Manager MCP Server - Secure git operations for multiple repositor
 """
 import os
 import sys
+import asyncio
+import itertools
 import logging
-import subprocess
-import re
+import shutil
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from mcp.server.fastmcp import FastMCP
 
+# Optional: batch the list_repos .git checks through io_uring on Linux
+try:
+    import liburing
+except ImportError:
+    liburing = None
+_uring_enabled = liburing is not None
+
+# Optional: invalidate cached output from inotify events on Linux instead of stat calls
+try:
+    import inotify_simple
+except ImportError:
+    inotify_simple = None
+
+# Optional: answer simple ref and history queries in-process through libgit2
+try:
+    import pygit2
+except ImportError:
+    pygit2 = None
+
 # Configure logging to stderr
 logging.basicConfig(
     level=logging.INFO,
@@ -23,8 +47,73 @@ mcp = FastMCP("gitrepo")
 
 # Configuration
 REPOS_BASE_PATH = os.environ.get("GIT_REPOS_PATH", "/repos")
+_BASE_PATH = Path(REPOS_BASE_PATH).resolve()
 MAX_OUTPUT_LENGTH = 10000
 GIT_TIMEOUT = 30
+AUTO_GC = os.environ.get("GIT_AUTOGC") == "1"
+URING_BATCH_SIZE = 256
+STAT_WORKERS = 32
+REPO_CACHE_SIZE = 32
+CACHE_MAX_SIZE = 256
+CACHE_TTL = 60
+STATUS_CACHE_TTL = 5
+
+# Read-only commands whose output may be cached, with their TTL in seconds
+CACHEABLE_COMMANDS = {
+    ("status",): STATUS_CACHE_TTL,
+    ("branch", "-a"): CACHE_TTL,
+    ("branch", "--show-current"): CACHE_TTL,
+    ("remote", "-v"): CACHE_TTL,
+    ("rev-list", "--count", "HEAD"): CACHE_TTL,
+    ("log", "--all", "--format=%aE%x09%aN"): CACHE_TTL,
+    ("for-each-ref", "--format=%(refname)", "refs/heads", "refs/remotes"): CACHE_TTL,
+}
+CACHEABLE_PREFIXES = {
+    ("log", "-z"): CACHE_TTL,
+}
+
+# Paths under .git, besides HEAD and REF_NAMESPACES, whose mtimes change whenever cached output can
+STAMP_PATHS = (
+    "index",
+    os.path.join("logs", "HEAD"),
+    "packed-refs",
+    "FETCH_HEAD",
+    "config",
+)
+
+# Ref directories tracked recursively: branch names can contain slashes, and
+# remote-tracking refs always live one directory down in refs/remotes/<remote>
+REF_NAMESPACES = (os.path.join("refs", "heads"), os.path.join("refs", "remotes"))
+
+# (repo_path, args tuple) -> (expires_at, stamp, output), in LRU order
+_CACHE: OrderedDict = OrderedDict()
+
+# Background gc waits, referenced until they finish so the event loop cannot drop them
+_BACKGROUND_TASKS: set = set()
+
+# repo_path -> pygit2.Repository, in LRU order
+_REPO_CACHE: OrderedDict = OrderedDict()
+
+# Every query is read-only: never take optional locks such as the index
+# refresh lock, and never block on a credential prompt. The opt-in
+# `git gc --auto` housekeeping writes to the repository and runs without these.
+GIT_ENV = {**os.environ, "GIT_OPTIONAL_LOCKS": "0", "GIT_TERMINAL_PROMPT": "0"}
+
+# An absolute executable path lets subprocess use posix_spawn instead of fork
+GIT_BINARY = shutil.which("git") or "git"
+
+# Characters stripped from user-supplied paths and from commit hashes
+_DANGEROUS_CHARS = str.maketrans('', '', ';&|`$(){}')
+_HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+_NON_HEX_CHARS = str.maketrans('', '', ''.join(chr(c) for c in range(128) if chr(c) not in _HEX_DIGITS))
+
+# `git log` arguments for one "<hash> <subject>" record per commit; a fixed
+# abbreviation keeps hash widths stable and NUL/unit separators survive any subject
+LOG_ABBREV = 12
+LOG_RECORD_ARGS = ["log", "-z", f"--abbrev={LOG_ABBREV}", "--format=%h%x1f%s"]
+
+# Abbreviated object names can be as short as 4 hex digits; full ones are SHA-1 or SHA-256
+MIN_HASH_LENGTH = 4
 
 # === UTILITY FUNCTIONS ===
 
@@ -33,11 +122,8 @@ def sanitize_path(path: str) -> str:
     if not path or not path.strip():
         return ""
     
-    # Remove dangerous characters
-    sanitized = re.sub(r'[;&|`$(){}]', '', path.strip())
-    
-    # Remove path traversal attempts
-    sanitized = sanitized.replace('..', '')
+    # Remove dangerous characters and path traversal attempts
+    sanitized = path.strip().translate(_DANGEROUS_CHARS).replace('..', '')
     
     return sanitized
 
@@ -51,62 +137,594 @@ def get_repo_path(repo_name: str) -> str:
         return ""
     
     # Build absolute path
-    repo_path = Path(REPOS_BASE_PATH) / sanitized
+    repo_path = _BASE_PATH / sanitized
     
     # Ensure it's within base path
     try:
         repo_path = repo_path.resolve()
-        base_path = Path(REPOS_BASE_PATH).resolve()
-        
-        if not str(repo_path).startswith(str(base_path)):
-            return ""
-        
+        repo_path.relative_to(_BASE_PATH)
         return str(repo_path)
     except Exception:
         return ""
 
-def run_git_command(repo_path: str, args: str, timeout: int = GIT_TIMEOUT) -> str:
-    """Execute a git command safely in the specified repository."""
+def check_git_repo(repo_path: str) -> str:
+    """Return an error message if the path is not a git repository, else an empty string."""
     if not repo_path or not os.path.isdir(repo_path):
         return "❌ Error: Invalid repository path"
     
-    # Check if it's a git repository
-    git_dir = Path(repo_path) / ".git"
-    if not git_dir.exists():
+    # Check if it's a git repository; .git is a file in worktrees and submodules
+    git_marker = repo_path + os.sep + ".git"
+    if not (os.path.isdir(git_marker) or os.path.isfile(git_marker)):
         return "❌ Error: Not a git repository"
     
+    return ""
+
+def git_command(repo_path: str, args) -> list[str]:
+    """Build the full git command line for a repository."""
+    return [GIT_BINARY, "-C", repo_path, "--no-optional-locks", *args]
+
+def cache_ttl(args: tuple):
+    """Return the cache TTL for a git command, or None if it must not be cached."""
+    if args in CACHEABLE_COMMANDS:
+        return CACHEABLE_COMMANDS[args]
+    for prefix, ttl in CACHEABLE_PREFIXES.items():
+        if args[:len(prefix)] == prefix:
+            return ttl
+    return None
+
+class GitDirWatcher:
+    """Tracks changes to each repository's HEAD, index, refs and config through inotify.
+
+    Every watched repository has a generation number that a background thread
+    replaces on each change, so cache validation is a dict lookup instead of stat calls.
+    Generations come from one global counter, so a repository that is deleted and
+    re-watched never reuses a generation that older cache entries were stamped with.
+    """
+
+    # Directory under .git -> names whose changes invalidate cached output; together
+    # with REF_NAMESPACES, the same paths STAMP_PATHS covers when stat stamps are used instead
+    WATCHED_PATHS = {
+        "": {"HEAD", "index", "packed-refs", "FETCH_HEAD", "config"},
+        "logs": {"HEAD"},
+        "refs": {"heads", "remotes"},
+    }
+
+    def __init__(self):
+        self.inotify = inotify_simple.INotify()
+        self.mask = (inotify_simple.flags.MODIFY | inotify_simple.flags.CREATE
+                     | inotify_simple.flags.MOVED_TO | inotify_simple.flags.DELETE)
+        self.generations: dict[str, int] = {}
+        # wd -> (repo_path, watched directory, names or None for any name)
+        self.wd_to_repo: dict[int, tuple[str, str, set | None]] = {}
+        self.unwatchable: set[str] = set()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="git-dir-watcher", daemon=True)
+        self._thread.start()
+
+    def generation(self, repo_path: str):
+        """Return the repository's change generation, or None if it cannot be watched."""
+        generation = self.generations.get(repo_path)
+        if generation is not None or repo_path in self.unwatchable:
+            return generation
+        return self._watch(repo_path)
+
+    def _watch(self, repo_path: str):
+        """Add watches on the .git directories where git replaces HEAD, index and refs and appends the reflog."""
+        git_dir = os.path.join(repo_path, ".git")
+        with self._lock:
+            if repo_path in self.generations:
+                return self.generations[repo_path]
+            
+            # Worktrees and submodules keep their git directory elsewhere
+            if not os.path.isdir(git_dir):
+                self.unwatchable.add(repo_path)
+                return None
+            
+            try:
+                for subdir, names in self.WATCHED_PATHS.items():
+                    path = os.path.join(git_dir, subdir)
+                    if os.path.isdir(path):
+                        self._add_watch(repo_path, path, names)
+                for namespace in REF_NAMESPACES:
+                    self._watch_tree(repo_path, os.path.join(git_dir, namespace))
+            except OSError as e:
+                self._give_up(repo_path, e)
+                return None
+            
+            generation = self.generations[repo_path] = next(self._counter)
+            return generation
+
+    def _add_watch(self, repo_path: str, path: str, names):
+        """Watch one directory for changes to the given names, or to any name when names is None."""
+        self.wd_to_repo[self.inotify.add_watch(path, self.mask)] = (repo_path, path, names)
+
+    def _watch_tree(self, repo_path: str, top: str):
+        """Watch a ref directory and every directory below it for any change."""
+        # os.walk skips directories that vanish mid-walk, and yields nothing if top is missing
+        for path, _, _ in os.walk(top):
+            self._add_watch(repo_path, path, None)
+
+    def _give_up(self, repo_path: str, error: OSError):
+        """Stop watching a repository, which then falls back to stat stamps."""
+        # Usually fs.inotify.max_user_watches
+        logger.warning(f"Cannot watch {repo_path}: {error}")
+        self.generations.pop(repo_path, None)
+        self.unwatchable.add(repo_path)
+
+    def _run(self):
+        """Bump the generation of every repository with a relevant change."""
+        while True:
+            events = self.inotify.read()
+            with self._lock:
+                for event in events:
+                    if event.mask & inotify_simple.flags.Q_OVERFLOW:
+                        # Events were lost; treat every repository as changed
+                        for repo_path in self.generations:
+                            self.generations[repo_path] = next(self._counter)
+                        continue
+                    
+                    watch = self.wd_to_repo.get(event.wd)
+                    if watch is None:
+                        continue
+                    
+                    repo_path, path, names = watch
+                    if event.mask & inotify_simple.flags.IGNORED:
+                        # The directory went away; forget the repository so it is re-watched
+                        del self.wd_to_repo[event.wd]
+                        self.generations.pop(repo_path, None)
+                        continue
+                    if names is not None and event.name not in names:
+                        continue
+                    if repo_path not in self.generations:
+                        continue
+                    
+                    if event.mask & inotify_simple.flags.ISDIR and event.mask & (
+                            inotify_simple.flags.CREATE | inotify_simple.flags.MOVED_TO):
+                        # A new ref directory such as refs/heads/feature; refs created in it
+                        # before the watch was added are covered by the bump below
+                        try:
+                            self._watch_tree(repo_path, os.path.join(path, event.name))
+                        except OSError as e:
+                            self._give_up(repo_path, e)
+                            continue
+                    self.generations[repo_path] = next(self._counter)
+
+try:
+    repo_watcher = GitDirWatcher() if inotify_simple is not None else None
+except OSError as e:
+    logger.warning(f"inotify unavailable, using stat-based cache validation: {e}")
+    repo_watcher = None
+
+def cache_stamp(repo_path: str):
+    """Return the stamp used to invalidate cached output for a repository."""
+    if repo_watcher is not None:
+        generation = repo_watcher.generation(repo_path)
+        if generation is not None:
+            return ("inotify", generation)
+    
+    return stat_stamp(repo_path)
+
+def stat_stamp(repo_path: str):
+    """Return the HEAD, index, ref and config mtimes used to invalidate cached output."""
+    git_dir = os.path.join(repo_path, ".git")
+    try:
+        head = os.stat(os.path.join(git_dir, "HEAD")).st_mtime_ns
+    except OSError:
+        return None
+    
+    # Commits move the branch ref without touching HEAD, but always append to the HEAD reflog;
+    # fetch rewrites FETCH_HEAD and remote add edits config
+    stamp = [head]
+    for name in STAMP_PATHS:
+        try:
+            stamp.append(os.stat(os.path.join(git_dir, name)).st_mtime_ns)
+        except OSError:
+            stamp.append(0)
+    
+    # Creating or deleting a ref renames or unlinks a file in its own directory,
+    # which may be any level below the namespace
+    for namespace in REF_NAMESPACES:
+        for path, _, _ in os.walk(os.path.join(git_dir, namespace)):
+            try:
+                stamp.append(os.stat(path).st_mtime_ns)
+            except OSError:
+                stamp.append(0)
+    return tuple(stamp)
+
+def cache_get(key: tuple, stamp) -> str:
+    """Return cached output for key if it is still fresh, else None."""
+    entry = _CACHE.get(key)
+    if entry is None:
+        return None
+    
+    expires_at, cached_stamp, output = entry
+    if expires_at < time.monotonic() or cached_stamp != stamp:
+        del _CACHE[key]
+        return None
+    
+    _CACHE.move_to_end(key)
+    return output
+
+def cache_put(key: tuple, stamp, output: str, ttl: int):
+    """Store output for key, evicting the least recently used entries."""
+    _CACHE[key] = (time.monotonic() + ttl, stamp, output)
+    _CACHE.move_to_end(key)
+    while len(_CACHE) > CACHE_MAX_SIZE:
+        _CACHE.popitem(last=False)
+
+def cache_lookup(repo_path: str, args: tuple):
+    """Return (stamp, ttl, output) for a command; stamp is None if it is not cacheable."""
+    ttl = cache_ttl(args)
+    stamp = cache_stamp(repo_path) if ttl else None
+    if stamp is None:
+        return None, None, None
+    return stamp, ttl, cache_get((repo_path, args), stamp)
+
+def format_git_output(returncode: int, stdout: str, stderr: str, truncated: bool = False) -> str:
+    """Turn a finished git command into the message returned to the client."""
+    output = stdout if stdout else stderr
+    
+    if truncated:
+        output += f"\n\n... [Output truncated at {MAX_OUTPUT_LENGTH} bytes]"
+    elif len(output) > MAX_OUTPUT_LENGTH:
+        output = output[:MAX_OUTPUT_LENGTH] + f"\n\n... [Output truncated. Total: {len(output)} chars]"
+    
+    if returncode == 0:
+        return output if output.strip() else "✅ Command completed successfully"
+    else:
+        return f"⚠️ Git command completed with status {returncode}:\n{output}"
+
+async def read_limited(stream, limit: int) -> bytes:
+    """Read a stream to EOF, keeping only the first limit bytes."""
+    data = bytearray()
+    while chunk := await stream.read(65536):
+        data += chunk[:limit - len(data)]
+    return bytes(data)
+
+def kill_process(proc) -> None:
+    """Kill a git subprocess, ignoring one that has already exited or been reaped."""
     try:
-        cmd = ["git", "-C", repo_path] + args.split()
+        proc.kill()
+    except ProcessLookupError:
+        pass
+
+async def read_bounded_output(proc) -> tuple[bytes, bytes, bool]:
+    """Read a process's stdout and stderr, keeping at most MAX_OUTPUT_LENGTH + 1 bytes of each.
+
+    Returns (stdout, stderr, truncated); git is killed as soon as stdout exceeds the limit.
+    """
+    limit = MAX_OUTPUT_LENGTH + 1
+    stderr_task = asyncio.ensure_future(read_limited(proc.stderr, limit))
+    try:
+        stdout = bytearray()
+        while len(stdout) < limit:
+            chunk = await proc.stdout.read(limit - len(stdout))
+            if not chunk:
+                break
+            stdout += chunk
         
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            timeout=timeout
+        truncated = len(stdout) >= limit
+        if truncated:
+            # Everything past the limit would be discarded, so stop git instead of draining it
+            kill_process(proc)
+        return bytes(stdout), await stderr_task, truncated
+    finally:
+        stderr_task.cancel()
+
+async def run_git_command(repo_path: str, args: list[str], timeout: int = GIT_TIMEOUT) -> str:
+    """Execute a git command safely in the specified repository without blocking the event loop."""
+    error = check_git_repo(repo_path)
+    if error:
+        return error
+    
+    # Serve repeated read-only queries from the cache while the repo is unchanged
+    args = tuple(args)
+    stamp, ttl, cached = cache_lookup(repo_path, args)
+    if cached is not None:
+        return cached
+    
+    try:
+        # stdin is the MCP stdio transport, so never let git inherit it;
+        # close_fds=False keeps Popen on the posix_spawn path (our own fds are non-inheritable)
+        proc = await asyncio.create_subprocess_exec(
+            *git_command(repo_path, args),
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=GIT_ENV,
+            close_fds=False
         )
         
-        output = result.stdout if result.stdout else result.stderr
+        try:
+            stdout, stderr, truncated = await asyncio.wait_for(read_bounded_output(proc), timeout)
+        except asyncio.TimeoutError:
+            kill_process(proc)
+            await proc.wait()
+            return f"⏱️ Command timed out after {timeout} seconds"
         
-        if len(output) > MAX_OUTPUT_LENGTH:
-            output = output[:MAX_OUTPUT_LENGTH] + f"\n\n... [Output truncated. Total: {len(output)} chars]"
+        returncode = await proc.wait()
+        if truncated:
+            returncode = 0
+        
+        # Only the bounded prefix is ever decoded
+        output = format_git_output(
+            returncode,
+            stdout[:MAX_OUTPUT_LENGTH].decode("utf-8", "replace"),
+            stderr[:MAX_OUTPUT_LENGTH].decode("utf-8", "replace"),
+            truncated
+        )
+        if returncode == 0 and stamp is not None:
+            cache_put((repo_path, args), stamp, output, ttl)
+        return output
         
-        if result.returncode == 0:
-            return output if output.strip() else "✅ Command completed successfully"
-        else:
-            return f"⚠️ Git command completed with status {result.returncode}:\n{output}"
-            
-    except subprocess.TimeoutExpired:
-        return f"⏱️ Command timed out after {timeout} seconds"
     except Exception as e:
         logger.error(f"Git command error: {e}")
         return f"❌ Error executing git command: {str(e)}"
 
+async def count_and_head(stream, n: int = 5) -> tuple[int, list[str]]:
+    """Count non-empty lines in a stream in one pass, keeping only the first n."""
+    count = 0
+    head = []
+    async for raw in stream:
+        line = raw.decode("utf-8", "replace").rstrip()
+        if line.strip():
+            count += 1
+            if len(head) < n:
+                head.append(line)
+    return count, head
+
+async def tally_authors(stream, n: int = 5) -> tuple[int, list[str]]:
+    """Count unique author emails and return the n most frequent author names, shortlog-style."""
+    emails = set()
+    names = Counter()
+    async for raw in stream:
+        email, _, name = raw.decode("utf-8", "replace").rstrip("\n").partition("\t")
+        emails.add(email)
+        names[name] += 1
+    
+    top = sorted(names.items(), key=lambda item: (-item[1], item[0]))[:n]
+    return len(emails), [f"{count:6d}\t{name}" for name, count in top]
+
+async def run_git_reduce(repo_path: str, args: list[str], reducer, timeout: int = GIT_TIMEOUT):
+    """Stream git stdout through an async reducer instead of buffering the whole output."""
+    args = tuple(args)
+    ttl = cache_ttl(args)
+    stamp = cache_stamp(repo_path) if ttl else None
+    key = (repo_path, args, reducer.__name__)
+    if stamp is not None:
+        cached = cache_get(key, stamp)
+        if cached is not None:
+            return cached
+    
+    proc = await asyncio.create_subprocess_exec(
+        *git_command(repo_path, args),
+        stdin=asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.DEVNULL,
+        env=GIT_ENV,
+        close_fds=False
+    )
+    
+    try:
+        result = await asyncio.wait_for(reducer(proc.stdout), timeout)
+    except BaseException:
+        kill_process(proc)
+        raise
+    finally:
+        await proc.wait()
+    
+    if proc.returncode == 0 and stamp is not None:
+        cache_put(key, stamp, result, ttl)
+    return result
+
+def open_repository(repo_path: str):
+    """Return a cached pygit2 Repository, or None when pygit2 is not installed."""
+    if pygit2 is None or check_git_repo(repo_path):
+        return None
+    
+    repo = _REPO_CACHE.get(repo_path)
+    if repo is None:
+        # Never fall through to a repository in a parent directory
+        repo = pygit2.Repository(repo_path, pygit2.enums.RepositoryOpenFlag.NO_SEARCH)
+        _REPO_CACHE[repo_path] = repo
+        while len(_REPO_CACHE) > REPO_CACHE_SIZE:
+            _, evicted = _REPO_CACHE.popitem(last=False)
+            evicted.free()
+    
+    _REPO_CACHE.move_to_end(repo_path)
+    return repo
+
+def libgit2_current_branch(repo_path: str) -> str:
+    """Equivalent of `git branch --show-current`; empty when git should answer instead."""
+    try:
+        repo = open_repository(repo_path)
+        if repo is None:
+            return ""
+        # Reading the symbolic target also works for unborn branches
+        head = repo.references["HEAD"].target
+        if not isinstance(head, str) or not head.startswith("refs/heads/"):
+            return ""
+        return head[len("refs/heads/"):]
+    except (pygit2.GitError, KeyError, ValueError) as e:
+        logger.debug(f"libgit2 fallback: {e}")
+        return ""
+
+def libgit2_branches(repo_path: str) -> str:
+    """Equivalent of `git branch -a`; empty when git should answer instead."""
+    try:
+        repo = open_repository(repo_path)
+        if repo is None or repo.head_is_detached:
+            return ""
+        
+        lines = []
+        for name in sorted(repo.branches.local):
+            marker = "*" if repo.branches.local[name].is_head() else " "
+            lines.append(f"{marker} {name}")
+        for name in sorted(repo.branches.remote):
+            ref = repo.references[f"refs/remotes/{name}"]
+            if isinstance(ref.target, str):
+                lines.append(f"  remotes/{name} -> {ref.target.removeprefix('refs/remotes/')}")
+            else:
+                lines.append(f"  remotes/{name}")
+        return "".join(f"{line}\n" for line in lines)
+    except (pygit2.GitError, KeyError, ValueError) as e:
+        logger.debug(f"libgit2 fallback: {e}")
+        return ""
+
+def libgit2_remotes(repo_path: str) -> str:
+    """Equivalent of `git remote -v`; empty when git should answer instead."""
+    try:
+        repo = open_repository(repo_path)
+        if repo is None:
+            return ""
+        
+        lines = []
+        for remote in repo.remotes:
+            # git lists every url or pushurl as its own (push) line, but libgit2 keeps only the last
+            for key in ("url", "pushurl"):
+                if len(list(repo.config.get_multivar(f"remote.{remote.name}.{key}"))) > 1:
+                    return ""
+            lines.append(f"{remote.name}\t{remote.url} (fetch)")
+            lines.append(f"{remote.name}\t{remote.push_url or remote.url} (push)")
+        return "".join(f"{line}\n" for line in lines)
+    except (pygit2.GitError, KeyError, ValueError) as e:
+        logger.debug(f"libgit2 fallback: {e}")
+        return ""
+
+def commit_subject(message: str) -> str:
+    """Return a commit's subject the way %s does: its first paragraph with lines joined by spaces."""
+    paragraph = []
+    for line in message.splitlines():
+        line = line.rstrip()
+        if line:
+            paragraph.append(line)
+        elif paragraph:
+            break
+    return " ".join(paragraph)
+
+def libgit2_log(repo_path: str, limit: int) -> str:
+    """Equivalent of the LOG_RECORD_ARGS log listing; empty when git should answer instead."""
+    try:
+        repo = open_repository(repo_path)
+        if repo is None or repo.head_is_unborn:
+            return ""
+        
+        walker = repo.walk(repo.head.target, pygit2.GIT_SORT_TOPOLOGICAL | pygit2.GIT_SORT_TIME)
+        lines = []
+        for commit in itertools.islice(walker, limit):
+            lines.append(f"{str(commit.id)[:LOG_ABBREV]} {commit_subject(commit.message)}")
+        return "".join(f"{line}\n" for line in lines)
+    except (pygit2.GitError, KeyError, ValueError) as e:
+        logger.debug(f"libgit2 fallback: {e}")
+        return ""
+
+async def start_auto_gc(repo_path: str):
+    """Start a detached `git gc --auto`, which git itself skips unless housekeeping is due.
+
+    The process is awaited by a background task so it is reaped without delaying the caller.
+    """
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            GIT_BINARY, "-C", repo_path, "gc", "--auto", "--quiet",
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+            close_fds=False,
+            start_new_session=True
+        )
+    except OSError as e:
+        logger.warning(f"Could not start git gc: {e}")
+        return
+    
+    task = asyncio.ensure_future(proc.wait())
+    _BACKGROUND_TASKS.add(task)
+    task.add_done_callback(_BACKGROUND_TASKS.discard)
+
+def format_log_records(output: str) -> str:
+    """Turn NUL-terminated `%h<US>%s` log records into "<hash> <subject>" lines."""
+    if "\x00" not in output:
+        # Error and empty-history messages pass through unchanged
+        return output
+    return "".join(f"{record.replace(chr(0x1f), ' ')}\n" for record in output.split("\x00") if record)
+
 def truncate_output(output: str) -> str:
     """Truncate long output."""
     if len(output) > MAX_OUTPUT_LENGTH:
         return output[:MAX_OUTPUT_LENGTH] + f"\n\n... [Truncated from {len(output)} chars]"
     return output
 
+def uring_find_git_markers(names: list[str]) -> list[bool]:
+    """Check for `<name>/.git` under the base path with batched io_uring statx calls."""
+    found = [False] * len(names)
+    dirfd = os.open(REPOS_BASE_PATH, os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        ring = liburing.Ring()
+        cqe = liburing.Cqe()
+        liburing.io_uring_queue_init(URING_BATCH_SIZE, ring)
+        try:
+            for start in range(0, len(names), URING_BATCH_SIZE):
+                # Paths and stat buffers must stay referenced until their completions are reaped
+                paths = [name + "/.git" for name in names[start:start + URING_BATCH_SIZE]]
+                buffers = []
+                for index, path in enumerate(paths, start):
+                    buffer = liburing.Statx()
+                    buffers.append(buffer)
+                    sqe = liburing.io_uring_get_sqe(ring)
+                    liburing.io_uring_prep_statx(sqe, buffer, path, dfd=dirfd)
+                    liburing.io_uring_sqe_set_data64(sqe, index)
+                
+                liburing.io_uring_submit_and_wait(ring, len(paths))
+                for _ in paths:
+                    liburing.io_uring_wait_cqe(ring, cqe)
+                    entry = cqe[0]
+                    try:
+                        index = liburing.io_uring_cqe_get_data64(entry)
+                        entry.res  # raises for failed stats such as ENOENT
+                        found[index] = True
+                    except OSError:
+                        pass
+                    finally:
+                        liburing.io_uring_cqe_seen(ring, entry)
+        finally:
+            liburing.io_uring_queue_exit(ring)
+    finally:
+        os.close(dirfd)
+    return found
+
+def find_git_markers(names: list[str]) -> list[bool]:
+    """Check which directories under the base path contain a .git entry."""
+    global _uring_enabled
+    if _uring_enabled and names:
+        try:
+            return uring_find_git_markers(names)
+        except Exception as e:
+            # Old kernels and container seccomp profiles reject io_uring; stop trying
+            logger.warning(f"io_uring unavailable, falling back to stat: {e}")
+            _uring_enabled = False
+    
+    paths = [os.path.join(REPOS_BASE_PATH, name, ".git") for name in names]
+    if len(paths) < 2:
+        return [os.path.exists(path) for path in paths]
+    
+    # Overlap the stats so a cold or networked mount costs about one round trip, not one per entry
+    with ThreadPoolExecutor(max_workers=min(STAT_WORKERS, len(paths))) as executor:
+        return list(executor.map(os.path.exists, paths))
+
+def scan_repos(filter_name: str = "") -> list[str]:
+    """Return the names of git repositories directly under the base path."""
+    # scandir entries carry the file type from readdir, so only the .git check costs a stat
+    needle = filter_name.strip().lower()
+    candidates = []
+    with os.scandir(REPOS_BASE_PATH) as entries:
+        for entry in entries:
+            if needle and needle not in entry.name.lower():
+                continue
+            if entry.is_dir():
+                candidates.append(entry.name)
+    
+    return [name for name, is_repo in zip(candidates, find_git_markers(candidates)) if is_repo]
+
 # === MCP TOOLS ===
 
 @mcp.tool()
@@ -115,18 +733,11 @@ async def list_repos(filter_name: str = "") -> str:
     logger.info("Listing repositories")
     
     try:
-        base = Path(REPOS_BASE_PATH)
-        
-        if not base.exists():
+        if not os.path.exists(REPOS_BASE_PATH):
             return f"❌ Base path does not exist: {REPOS_BASE_PATH}"
         
-        repos = []
-        for item in base.iterdir():
-            if item.is_dir():
-                git_dir = item / ".git"
-                if git_dir.exists():
-                    if not filter_name.strip() or filter_name.strip().lower() in item.name.lower():
-                        repos.append(item.name)
+        # Directory scanning is blocking I/O; keep it off the event loop
+        repos = await asyncio.to_thread(scan_repos, filter_name)
         
         if not repos:
             return "📁 No git repositories found"
@@ -152,7 +763,7 @@ async def repo_status(repo_name: str = "") -> str:
     if not repo_path:
         return "❌ Error: Invalid repository name"
     
-    result = run_git_command(repo_path, "status")
+    result = await run_git_command(repo_path, ["status"])
     
     return f"📊 Status for {repo_name}:\n\n{result}"
 
@@ -175,7 +786,9 @@ async def repo_log(repo_name: str = "", limit: str = "10") -> str:
     except ValueError:
         limit_int = 10
     
-    result = run_git_command(repo_path, f"log --oneline -n {limit_int}")
+    result = libgit2_log(repo_path, limit_int) or format_log_records(
+        await run_git_command(repo_path, [*LOG_RECORD_ARGS, "-n", str(limit_int)])
+    )
     
     return f"📜 Last {limit_int} commits for {repo_name}:\n\n{result}"
 
@@ -191,7 +804,7 @@ async def repo_branches(repo_name: str = "") -> str:
     if not repo_path:
         return "❌ Error: Invalid repository name"
     
-    result = run_git_command(repo_path, "branch -a")
+    result = libgit2_branches(repo_path) or await run_git_command(repo_path, ["branch", "-a"])
     
     return f"🌿 Branches for {repo_name}:\n\n{result}"
 
@@ -211,10 +824,10 @@ async def repo_diff(repo_name: str = "", file_path: str = "") -> str:
         sanitized_file = sanitize_path(file_path)
         if not sanitized_file:
             return "❌ Error: Invalid file path"
-        result = run_git_command(repo_path, f"diff {sanitized_file}")
+        result = await run_git_command(repo_path, ["diff", "--", sanitized_file])
         target = f"file {sanitized_file}"
     else:
-        result = run_git_command(repo_path, "diff")
+        result = await run_git_command(repo_path, ["diff"])
         target = "repository"
     
     if not result.strip() or result == "✅ Command completed successfully":
@@ -234,7 +847,7 @@ async def repo_remote(repo_name: str = "") -> str:
     if not repo_path:
         return "❌ Error: Invalid repository name"
     
-    result = run_git_command(repo_path, "remote -v")
+    result = libgit2_remotes(repo_path) or await run_git_command(repo_path, ["remote", "-v"])
     
     if not result.strip() or result == "✅ Command completed successfully":
         return f"🌐 No remotes configured for {repo_name}"
@@ -253,7 +866,7 @@ async def repo_current_branch(repo_name: str = "") -> str:
     if not repo_path:
         return "❌ Error: Invalid repository name"
     
-    result = run_git_command(repo_path, "branch --show-current")
+    result = libgit2_current_branch(repo_path) or await run_git_command(repo_path, ["branch", "--show-current"])
     
     if result.strip() and not result.startswith("❌") and not result.startswith("⚠️"):
         return f"🌿 Current branch: {result.strip()}"
@@ -276,11 +889,15 @@ async def repo_show_commit(repo_name: str = "", commit_hash: str = "") -> str:
         return "❌ Error: Invalid repository name"
     
     # Validate commit hash format (alphanumeric only)
-    sanitized_hash = re.sub(r'[^a-fA-F0-9]', '', commit_hash.strip())
-    if not sanitized_hash:
+    sanitized_hash = commit_hash.strip().translate(_NON_HEX_CHARS)
+    if not sanitized_hash or not sanitized_hash.isascii():
+        return "❌ Error: Invalid commit hash format"
+    
+    # Reject lengths no object name can have before touching git at all
+    if not (MIN_HASH_LENGTH <= len(sanitized_hash) <= 40 or len(sanitized_hash) == 64):
         return "❌ Error: Invalid commit hash format"
     
-    result = run_git_command(repo_path, f"show {sanitized_hash}")
+    result = await run_git_command(repo_path, ["show", sanitized_hash])
     
     return f"📝 Commit {sanitized_hash} in {repo_name}:\n\n{result}"
 
@@ -310,7 +927,9 @@ async def repo_file_history(repo_name: str = "", file_path: str = "", limit: str
     except ValueError:
         limit_int = 10
     
-    result = run_git_command(repo_path, f"log --oneline -n {limit_int} -- {sanitized_file}")
+    result = format_log_records(
+        await run_git_command(repo_path, [*LOG_RECORD_ARGS, "-n", str(limit_int), "--", sanitized_file])
+    )
     
     return f"📜 History for {sanitized_file} in {repo_name}:\n\n{result}"
 
@@ -329,10 +948,8 @@ async def repo_search(repo_name: str = "", search_term: str = "") -> str:
     if not repo_path:
         return "❌ Error: Invalid repository name"
     
-    # Escape special characters for grep
-    escaped_term = search_term.strip().replace('"', '\\"')
-    
-    result = run_git_command(repo_path, f'grep -n "{escaped_term}"')
+    # Fixed-string match; -e keeps terms starting with "-" from being read as options
+    result = await run_git_command(repo_path, ["grep", "-n", "-F", "-e", search_term.strip()])
     
     if "fatal:" in result.lower() or not result.strip():
         return f"🔍 No matches found for '{search_term}' in {repo_name}"
@@ -351,19 +968,19 @@ async def repo_stats(repo_name: str = "") -> str:
     if not repo_path:
         return "❌ Error: Invalid repository name"
     
+    error = check_git_repo(repo_path)
+    if error:
+        return error
+    
     try:
-        # Get commit count
-        commit_count = run_git_command(repo_path, "rev-list --count HEAD")
-        
-        # Get contributor count
-        contributors = run_git_command(repo_path, "shortlog -sn --all")
-        contributor_lines = [line for line in contributors.split('\n') if line.strip()]
-        contributor_count = len(contributor_lines)
-        
-        # Get branch count
-        branches = run_git_command(repo_path, "branch -a")
-        branch_lines = [line for line in branches.split('\n') if line.strip()]
-        branch_count = len(branch_lines)
+        # Commit count, contributors and branches are independent queries;
+        # one streamed log walk replaces shortlog's buffered, sorted output,
+        # and for-each-ref lists refs without the formatting work of `branch -a`
+        commit_count, (contributor_count, top_contributors), (branch_count, _) = await asyncio.gather(
+            run_git_command(repo_path, ["rev-list", "--count", "HEAD"]),
+            run_git_reduce(repo_path, ["log", "--all", "--format=%aE%x09%aN"], tally_authors),
+            run_git_reduce(repo_path, ["for-each-ref", "--format=%(refname)", "refs/heads", "refs/remotes"], count_and_head)
+        )
         
         stats = f"""📊 Repository Statistics for {repo_name}:
 
@@ -372,16 +989,30 @@ async def repo_stats(repo_name: str = "") -> str:
 🌿 Branches: {branch_count}
 
 Top Contributors:
-{chr(10).join(contributor_lines[:5])}"""
+{chr(10).join(top_contributors)}"""
+        
+        # Stats already walked the full history; let git repack loose objects if needed
+        if AUTO_GC:
+            await start_auto_gc(repo_path)
         
         return stats
         
+    except asyncio.TimeoutError:
+        return f"⏱️ Command timed out after {GIT_TIMEOUT} seconds"
     except Exception as e:
         logger.error(f"Error getting stats: {e}")
         return f"❌ Error: {str(e)}"
 
 # === SERVER STARTUP ===
 if __name__ == "__main__":
+    # uvloop is optional; it cuts per-message overhead of the stdio transport
+    try:
+        import uvloop
+        asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
+        logger.info("Using uvloop event loop")
+    except ImportError:
+        pass
+    
     logger.info("Starting Git Repository Manager MCP server...")
     logger.info(f"Repository base path: {REPOS_BASE_PATH}")
     
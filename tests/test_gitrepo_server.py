@@ -0,0 +1,282 @@
+import asyncio
+import os
+import shutil
+import subprocess
+import time
+from collections import OrderedDict
+
+import pytest
+
+import gitrepo_server as server
+
+
+def git(repo, *args):
+    """Run a git command in repo with a fixed identity, returning its stdout."""
+    return subprocess.run(
+        ["git", "-C", str(repo), "-c", "user.name=Test", "-c", "user.email=test@example.com", *args],
+        check=True, capture_output=True, text=True
+    ).stdout
+
+
+def make_repo(path, branch="main"):
+    """Create a repository at path with a single commit."""
+    subprocess.run(["git", "init", "-q", "-b", branch, str(path)], check=True)
+    git(path, "commit", "-q", "--allow-empty", "-m", "first")
+    return str(path)
+
+
+@pytest.fixture
+def base_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(server, "REPOS_BASE_PATH", str(tmp_path))
+    monkeypatch.setattr(server, "_BASE_PATH", tmp_path.resolve())
+    monkeypatch.setattr(server, "_CACHE", OrderedDict())
+    return tmp_path
+
+
+def test_get_repo_path_rejects_sibling_with_shared_prefix(tmp_path, monkeypatch):
+    base = tmp_path / "repos"
+    sibling = tmp_path / "reposfoo"
+    make_repo(base / "inside")
+    make_repo(sibling)
+    (base / "link").symlink_to(sibling)
+    monkeypatch.setattr(server, "_BASE_PATH", base.resolve())
+
+    assert server.get_repo_path("inside") == str((base / "inside").resolve())
+    # Both resolve to a path that starts with the base path's string but lies outside it
+    assert server.get_repo_path(str(sibling)) == ""
+    assert server.get_repo_path("link") == ""
+
+
+@pytest.fixture(params=["stat", "inotify"])
+def stamp_kind(request, base_path, monkeypatch):
+    if request.param == "stat":
+        monkeypatch.setattr(server, "repo_watcher", None)
+    elif server.repo_watcher is None:
+        pytest.skip("inotify is unavailable")
+    return request.param
+
+
+def wait_for_stamp_change(repo_path, before, timeout=5.0):
+    """Wait until the cache stamp differs from before; inotify events arrive asynchronously."""
+    deadline = time.monotonic() + timeout
+    while server.cache_stamp(repo_path) == before:
+        assert time.monotonic() < deadline, "cache stamp did not change"
+        time.sleep(0.01)
+
+
+async def cached(repo_path, args):
+    """Run a cacheable command, checking that its output was cached."""
+    output = await server.run_git_command(repo_path, args)
+    assert (repo_path, tuple(args)) in server._CACHE
+    return output
+
+
+def mutate(repo_path, action):
+    """Apply action to a repository and wait until its cache stamp reflects it."""
+    before = server.cache_stamp(repo_path)
+    assert before is not None
+    # Stat stamps compare mtimes, which coarse filesystem clocks can leave unchanged within a tick
+    time.sleep(0.05)
+    action()
+    wait_for_stamp_change(repo_path, before)
+
+
+def test_commit_invalidates_cached_output(base_path, stamp_kind):
+    repo = make_repo(base_path / "repo")
+
+    async def scenario():
+        assert (await cached(repo, ["rev-list", "--count", "HEAD"])).strip() == "1"
+        if stamp_kind == "inotify":
+            assert server.cache_stamp(repo)[0] == "inotify"
+        mutate(repo, lambda: git(repo, "commit", "-q", "--allow-empty", "-m", "second"))
+        assert (await cached(repo, ["rev-list", "--count", "HEAD"])).strip() == "2"
+
+    asyncio.run(scenario())
+
+
+def test_branch_create_invalidates_cached_output(base_path, stamp_kind):
+    repo = make_repo(base_path / "repo")
+    args = ["for-each-ref", "--format=%(refname)", "refs/heads", "refs/remotes"]
+
+    async def scenario():
+        assert "feature" not in await cached(repo, ["branch", "-a"])
+        assert "feature" not in await cached(repo, args)
+        mutate(repo, lambda: git(repo, "branch", "feature"))
+        assert "feature" in await cached(repo, ["branch", "-a"])
+        assert "refs/heads/feature" in await cached(repo, args)
+        # Slashed names create refs below refs/heads, in a new directory and then an existing one
+        for name in ("nested/y", "nested/x"):
+            mutate(repo, lambda: git(repo, "branch", name))
+            assert name in await cached(repo, ["branch", "-a"])
+            assert f"refs/heads/{name}" in await cached(repo, args)
+
+    asyncio.run(scenario())
+
+
+def test_remote_add_invalidates_cached_output(base_path, stamp_kind):
+    repo = make_repo(base_path / "repo")
+    upstream = make_repo(base_path / "upstream")
+
+    async def scenario():
+        assert "origin" not in await cached(repo, ["remote", "-v"])
+        mutate(repo, lambda: git(repo, "remote", "add", "origin", upstream))
+        assert "origin" in await cached(repo, ["remote", "-v"])
+        mutate(repo, lambda: git(repo, "fetch", "-q", "origin"))
+        assert "remotes/origin/main" in await cached(repo, ["branch", "-a"])
+        # A push records its remote-tracking ref without writing FETCH_HEAD
+        mutate(repo, lambda: git(repo, "push", "-q", "origin", "main:pushed"))
+        assert "remotes/origin/pushed" in await cached(repo, ["branch", "-a"])
+
+    asyncio.run(scenario())
+
+
+def test_recreated_repo_invalidates_cached_output(base_path, stamp_kind):
+    path = base_path / "repo"
+    repo = make_repo(path)
+
+    def recreate():
+        shutil.rmtree(path)
+        make_repo(path, branch="other")
+
+    async def scenario():
+        assert (await cached(repo, ["branch", "--show-current"])).strip() == "main"
+        mutate(repo, recreate)
+        assert (await cached(repo, ["branch", "--show-current"])).strip() == "other"
+
+    asyncio.run(scenario())
+
+
+def test_search_matches_phrases_and_dash_terms(base_path):
+    repo = make_repo(base_path / "repo")
+    (base_path / "repo" / "notes.txt").write_text("hello world\n--verbose flag\n")
+    git(repo, "add", "notes.txt")
+    git(repo, "commit", "-q", "-m", "notes")
+
+    async def scenario():
+        assert "notes.txt:1:hello world" in await server.repo_search("repo", "hello world")
+        assert "notes.txt:2:--verbose flag" in await server.repo_search("repo", "--verbose")
+        assert "notes.txt" not in await server.repo_search("repo", "world hello")
+
+    asyncio.run(scenario())
+
+
+def test_diff_treats_file_path_as_path(base_path):
+    repo = make_repo(base_path / "repo")
+    for name in ("-p", "other.txt"):
+        (base_path / "repo" / name).write_text("before\n")
+    git(repo, "add", "--", "-p", "other.txt")
+    git(repo, "commit", "-q", "-m", "files")
+    for name in ("-p", "other.txt"):
+        (base_path / "repo" / name).write_text("after\n")
+
+    result = asyncio.run(server.repo_diff("repo", "-p"))
+    assert "+++ b/-p" in result
+    assert "other.txt" not in result
+
+
+class ExitedProcess:
+    """Stand-in for a git process that exited and was reaped before it could be killed."""
+
+    def __init__(self, stdout: bytes):
+        self.stdout = asyncio.StreamReader()
+        self.stdout.feed_data(stdout)
+        self.stdout.feed_eof()
+        self.stderr = asyncio.StreamReader()
+        self.stderr.feed_eof()
+        self.kills = 0
+
+    def kill(self):
+        self.kills += 1
+        raise ProcessLookupError
+
+
+def test_truncation_tolerates_exited_process(monkeypatch):
+    monkeypatch.setattr(server, "MAX_OUTPUT_LENGTH", 10)
+
+    async def scenario():
+        proc = ExitedProcess(b"x" * 100)
+        stdout, stderr, truncated = await server.read_bounded_output(proc)
+        assert (stdout, stderr, truncated) == (b"x" * 11, b"", True)
+        assert proc.kills == 1
+
+    asyncio.run(scenario())
+
+
+def test_run_git_command_truncates_and_kills(base_path, monkeypatch):
+    repo = make_repo(base_path / "repo")
+    (base_path / "repo" / "big.txt").write_text("0123456789\n" * 100000)
+    git(repo, "add", "big.txt")
+    git(repo, "commit", "-q", "-m", "big")
+    monkeypatch.setattr(server, "MAX_OUTPUT_LENGTH", 100)
+
+    output = asyncio.run(server.run_git_command(repo, ["show", "HEAD:big.txt"]))
+    assert output.startswith("0123456789\n" * 9)
+    assert output.endswith("[Output truncated at 100 bytes]")
+
+
+@pytest.fixture
+def uring():
+    if server.liburing is None:
+        pytest.skip("liburing is not installed")
+    ring = server.liburing.Ring()
+    try:
+        server.liburing.io_uring_queue_init(1, ring)
+    except Exception as e:
+        pytest.skip(f"io_uring is unavailable: {e}")
+    server.liburing.io_uring_queue_exit(ring)
+
+
+def test_uring_markers_match_stat(base_path, monkeypatch, uring):
+    # A small batch size makes the scan span several submissions
+    monkeypatch.setattr(server, "URING_BATCH_SIZE", 4)
+    names = []
+    for i in range(5):
+        subprocess.run(["git", "init", "-q", str(base_path / f"repo{i}")], check=True)
+        (base_path / f"plain{i}").mkdir()
+        names += [f"repo{i}", f"plain{i}"]
+    (base_path / "worktree").mkdir()
+    (base_path / "worktree" / ".git").write_text("gitdir: /elsewhere\n")
+    (base_path / "dangling").mkdir()
+    os.symlink(base_path / "missing", base_path / "dangling" / ".git")
+    names += ["worktree", "dangling", "absent"]
+
+    expected = [os.path.exists(os.path.join(base_path, name, ".git")) for name in names]
+    assert server.uring_find_git_markers(names) == expected
+    monkeypatch.setattr(server, "_uring_enabled", False)
+    assert server.find_git_markers(names) == expected
+
+
+@pytest.fixture
+def libgit2():
+    if server.pygit2 is None:
+        pytest.skip("pygit2 is not installed")
+
+
+def test_libgit2_log_matches_cli(base_path, libgit2):
+    repo = make_repo(base_path / "repo")
+    for message in ["a  b\tc", "\n\n  lead  x\nsecond\tline  \n\nbody", "one\n   \ntwo", "trailing   \nnext"]:
+        git(repo, "commit", "-q", "--allow-empty", "--cleanup=verbatim", "-m", message)
+
+    records = git(repo, *server.LOG_RECORD_ARGS, "-n", "10").split("\0")
+    expected = "".join(record.replace("\x1f", " ") + "\n" for record in records if record)
+    assert server.libgit2_log(repo, 10) == expected
+
+
+@pytest.mark.parametrize("extra_config, answered", [
+    ([], True),
+    ([("remote.origin.pushurl", "/tmp/push")], True),
+    ([("remote.origin.pushurl", "/tmp/p1"), ("remote.origin.pushurl", "/tmp/p2")], False),
+    ([("remote.origin.url", "/tmp/second")], False),
+])
+def test_libgit2_remotes_matches_cli(base_path, libgit2, extra_config, answered):
+    repo = make_repo(base_path / "repo")
+    git(repo, "remote", "add", "origin", "/tmp/fetch")
+    git(repo, "remote", "add", "backup", "/tmp/backup")
+    for key, value in extra_config:
+        git(repo, "config", "--add", key, value)
+
+    output = server.libgit2_remotes(repo)
+    # Configurations libgit2 cannot reproduce must fall back to the CLI
+    assert bool(output) == answered
+    if answered:
+        assert output == git(repo, "remote", "-v")